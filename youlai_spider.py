@@ -1,29 +1,82 @@
 import time
+import asyncio
+import httpx
+import pyarrow as pa
+import pyarrow.parquet as pq
+from selectolax.parser import HTMLParser
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 import json
 import os
 import csv
-import re
+import mmap
 import logging
 import random
+import pickle
+import sqlite3
+import functools
+import gc
+import atexit
+import signal
+import concurrent.futures
+import multiprocessing.util
+from pybloom_live import ScalableBloomFilter
 
 # --- 定义文件名 ---
-PROGRESS_FILE = 'crawl_progress.json'
-PENDING_DOCTORS_FILE = 'pending_doctors.json'
+PROGRESS_FILE = 'crawl_progress.json'  # 旧版进度文件，仅用于首次启动时迁移
+PENDING_DOCTORS_FILE = 'pending_doctors.json'  # 旧版待抓取清单，仅用于首次启动时迁移
+STATE_DB_FILE = 'state.db'
+BLOOM_FILTER_FILE = 'doctor_urls.bloom'
 DOCTORS_CSV_DIR = 'hospital_doctors_data'
 HOSPITALS_OUTPUT_FILE = 'hospitals_info.csv'
+SCRAPE_CACHE_FILE = 'scrape_cache.sqlite'
 LOG_FILE = 'scraper.log'
 
+# 长时间运行时Chrome内存会持续膨胀，每处理这么多家医院就重启一次浏览器
+HOSPITALS_PER_DRIVER_RESTART = 50
+
+# 医生详情抓取的并行Chrome实例数（每个工作进程一个，约300MB内存/个）
+DOCTOR_DETAIL_WORKERS = 4
+
+# 所有HTTP抓取共用的连接池参数：keepalive免去每请求的TLS握手，
+# HTTP/2多路复用再省一截小响应页面的开销
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+
 # --- 定义CSV文件的表头 ---
 DOCTORS_CSV_HEADERS = ['姓名', '职称', '医院', '主科室', '子科室', '简介', '擅长', '医生页链接', '头像链接']
+# 医生数据主存储为Parquet（列式+字典编码，磁盘占用和下游读取都远优于CSV）
+DOCTORS_SCHEMA = pa.schema([(name, pa.string()) for name in DOCTORS_CSV_HEADERS])
+# 需要CSV副本时设为True
+EXPORT_DOCTORS_CSV = False
 HOSPITALS_CSV_HEADERS = ['医院序号', '医院名称', 'Logo链接', '标签', '医院介绍', '医院官网', '医院页面链接']
 
+# --- 页面元素选择器 ---
+# --- [优化] --- 选择器模式是不变量，统一用模块级CSS常量：chromedriver把CSS
+# 交给Blink原生选择器引擎执行，比XPath快，且Selenium和selectolax两边可复用
+CSS_HOSPITAL_NAME_TAG = "div[class*='nameTag--J1Jna']"
+CSS_HOSPITAL_NAME = "h1[class*='name--uPsBN']"
+CSS_HOSPITAL_LOGO = "div[class*='logo--tbtwr'] img"
+CSS_HOSPITAL_TAGS = "ul[class*='tags--7DM1e'] span"
+CSS_HOSPITAL_INTRO = "div[class*='lineClamp__3']"
+CSS_DOCTOR_CONTAINER = "section[class*='doctorInfoContainer']"
+CSS_DOCTOR_BLOCK = "a[class*='block--Ux6NX']"
+CSS_SUB_DEPT = "div[class*='levelTwo--Ntq0X'] > div[class*='text--']"
+
+# 医生详情页的字段选择器映射，供 extract_fields 使用
+DOCTOR_FIELD_SPEC = {
+    '姓名': 'span.doc-name',
+    '职称': "div[class*='doctorInfo--'] h3 a span",
+    '子科室': 'div.doc-dept',
+    '简介': "div[class*='doctorInfoExtraIntro']",
+    '擅长': "div[class*='doctorInfoExtraSkill']",
+    '头像链接': ("div[class*='avatarBox--gNp0Z'] img", 'src'),
+}
+
 
 # --- 日志配置 ---
 def setup_logging(level=logging.INFO):
@@ -44,22 +97,117 @@ def setup_logging(level=logging.INFO):
     logger.addHandler(file_handler)
 
 
-# --- 进度和任务清单管理函数 (这部分无需修改) ---
+# --- URL抓取结果缓存 ---
+SCRAPE_CACHE_TTL = 7 * 86400  # 缓存7天内的抓取结果
+
+_cache_conn = None
+
+
+def _get_cache_conn():
+    """延迟创建并复用SQLite缓存连接"""
+    global _cache_conn
+    if _cache_conn is None:
+        _cache_conn = sqlite3.connect(SCRAPE_CACHE_FILE)
+        _cache_conn.execute(
+            "CREATE TABLE IF NOT EXISTS scrape_cache (url TEXT PRIMARY KEY, fetched_at INTEGER, payload TEXT)")
+        _cache_conn.commit()
+    return _cache_conn
+
+
+def cache_lookup(url, ttl=SCRAPE_CACHE_TTL):
+    """查询URL的缓存结果，未命中或已过期返回 None"""
+    try:
+        row = _get_cache_conn().execute(
+            "SELECT fetched_at, payload FROM scrape_cache WHERE url = ?", (url,)).fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"读取抓取缓存失败: {e}")
+        return None
+    if row is None or time.time() - row[0] > ttl:
+        return None
+    return json.loads(row[1])
+
+
+def cache_store(url, payload):
+    """把解析结果以JSON形式写入缓存"""
+    try:
+        conn = _get_cache_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO scrape_cache (url, fetched_at, payload) VALUES (?, ?, ?)",
+            (url, int(time.time()), json.dumps(payload, ensure_ascii=False)))
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"写入抓取缓存失败: {e}")
+
+
+def cached(make_url, should_cache=lambda result: True, ttl=SCRAPE_CACHE_TTL):
+    """装饰器：抓取前先查本地缓存，命中则完全跳过网络请求。
+
+    make_url 从被装饰函数的实参中提取作为缓存键的URL；should_cache 判断
+    返回值是否值得缓存（只缓存成功的抓取）。崩溃后重跑时，已抓到但还没
+    写进CSV的URL可以直接从缓存恢复。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            url = make_url(*args, **kwargs)
+            hit = cache_lookup(url, ttl)
+            if hit is not None:
+                logging.info(f"缓存命中，跳过抓取: {url}")
+                return tuple(hit) if isinstance(hit, list) else hit
+            result = func(*args, **kwargs)
+            if should_cache(result):
+                cache_store(url, result)
+            return result
+        return wrapper
+    return decorator
+
+
+# --- 进度和任务清单管理函数 ---
+# --- [优化] --- 进度和待抓取清单存进WAL模式的SQLite：单行UPSERT原子提交，
+# 不再整文件重写，崩溃也不会留下半个JSON
+_state_conn = None
+
+
+def _get_state_conn():
+    """延迟创建并复用进度数据库连接"""
+    global _state_conn
+    if _state_conn is None:
+        _state_conn = sqlite3.connect(STATE_DB_FILE, isolation_level=None)
+        _state_conn.execute("PRAGMA journal_mode=WAL")
+        _state_conn.execute("CREATE TABLE IF NOT EXISTS progress (key TEXT PRIMARY KEY, value TEXT)")
+        _state_conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending (url TEXT PRIMARY KEY, avatar_src TEXT, enqueued_at INTEGER, "
+            "main_dept TEXT, hospital_name TEXT, parquet_path TEXT)")
+        # 旧版state.db的pending表没有抓取上下文列，启动时补齐
+        existing_cols = {row[1] for row in _state_conn.execute("PRAGMA table_info(pending)")}
+        for column in ('main_dept', 'hospital_name', 'parquet_path'):
+            if column not in existing_cols:
+                _state_conn.execute(f"ALTER TABLE pending ADD COLUMN {column} TEXT")
+    return _state_conn
+
+
 def load_progress():
     """加载完整的爬取进度，包括医院范围和当前位置"""
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                logging.warning(f"'{PROGRESS_FILE}' 文件损坏或为空, 将使用默认配置.")
-                pass
-    return {
+    progress = {
         "hospital_range": "1-10099",  # 默认范围可以设大一些
         "current_hospital_id": 1,
         "main_dept_index": 0,
         "sub_dept_index": 0
     }
+    rows = _get_state_conn().execute("SELECT key, value FROM progress").fetchall()
+    if not rows and os.path.exists(PROGRESS_FILE):
+        # 首次启动时把旧版JSON进度迁移进数据库
+        try:
+            with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
+                progress.update(json.load(f))
+            save_progress(progress['current_hospital_id'], progress['main_dept_index'],
+                          progress['sub_dept_index'], progress['hospital_range'])
+        except json.JSONDecodeError:
+            logging.warning(f"'{PROGRESS_FILE}' 文件损坏或为空, 将使用默认配置.")
+        return progress
+    for key, value in rows:
+        progress[key] = json.loads(value)
+    return progress
 
 
 def save_progress(hospital_id, main_index, sub_index, hospital_range):
@@ -70,29 +218,62 @@ def save_progress(hospital_id, main_index, sub_index, hospital_range):
         "main_dept_index": main_index,
         "sub_dept_index": sub_index
     }
-    with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(progress, f, indent=2)
+    conn = _get_state_conn()
+    # 连接是autocommit模式，显式开事务让四个key一起落盘，
+    # 避免崩溃时只更新了一半进度
+    conn.execute("BEGIN")
+    try:
+        conn.executemany(
+            "INSERT INTO progress (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            [(key, json.dumps(value)) for key, value in progress.items()])
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
 
 
 def save_pending_doctors(targets):
-    with open(PENDING_DOCTORS_FILE, 'w', encoding='utf-8') as f:
-        json.dump({'targets': targets}, f, indent=2)
+    """整体替换待抓取医生清单"""
+    conn = _get_state_conn()
+    conn.execute("BEGIN")
+    try:
+        conn.execute("DELETE FROM pending")
+        conn.executemany(
+            "INSERT OR REPLACE INTO pending (url, avatar_src, enqueued_at, main_dept, hospital_name, parquet_path) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(target['url'], target.get('avatar_src', 'N/A'), int(time.time()),
+              target.get('main_dept'), target.get('hospital_name'), target.get('parquet_path'))
+             for target in targets])
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
 
 
 def load_pending_doctors():
-    if os.path.exists(PENDING_DOCTORS_FILE):
-        with open(PENDING_DOCTORS_FILE, 'r', encoding='utf-8') as f:
-            try:
-                return json.load(f).get('targets', [])
-            except json.JSONDecodeError:
-                return []
-    return []
-
-
-def remove_doctor_from_pending(url):
-    pending_targets = load_pending_doctors()
-    updated_targets = [target for target in pending_targets if target.get('url') != url]
-    save_pending_doctors(updated_targets)
+    rows = _get_state_conn().execute(
+        "SELECT url, avatar_src, main_dept, hospital_name, parquet_path "
+        "FROM pending ORDER BY enqueued_at").fetchall()
+    if not rows and os.path.exists(PENDING_DOCTORS_FILE):
+        # 首次启动时把旧版JSON清单迁移进数据库
+        try:
+            with open(PENDING_DOCTORS_FILE, 'r', encoding='utf-8') as f:
+                targets = json.load(f).get('targets', [])
+        except json.JSONDecodeError:
+            return []
+        if targets:
+            save_pending_doctors(targets)
+        return targets
+    targets = []
+    for url, avatar_src, main_dept, hospital_name, parquet_path in rows:
+        target = {'url': url, 'avatar_src': avatar_src}
+        # 失败重试的医生带有自己的抓取上下文，普通待抓取医生这几列为NULL
+        if main_dept is not None:
+            target.update(main_dept=main_dept, hospital_name=hospital_name,
+                          parquet_path=parquet_path)
+        targets.append(target)
+    return targets
 
 
 # --- 文件和数据加载函数 ---
@@ -107,88 +288,456 @@ def load_existing_links_from_csv(filepath, link_column):
     links = set()
     try:
         with open(filepath, 'r', newline='', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if link_column in row and row[link_column]:
-                    links.add(row[link_column])
+            # --- [优化] --- 只需要一列，用csv.reader按列索引取值，
+            # 避免DictReader为每行构造一个字典
+            reader = csv.reader(f)
+            headers = next(reader, None)
+            if headers is None or link_column not in headers:
+                return links
+            idx = headers.index(link_column)
+            links = {row[idx] for row in reader if len(row) > idx and row[idx]}
         logging.info(f"从 '{os.path.basename(filepath)}' 加载了 {len(links)} 条已存在的链接.")
     except Exception as e:
         logging.error(f"读取CSV '{filepath}' 时出错: {e}")
     return links
 
 
-def append_to_csv(data_dict, filepath, headers):
-    """通用函数，追加数据到指定的CSV文件"""
-    file_exists = os.path.exists(filepath)
+# 进程退出时兜底flush并关闭所有仍打开的CSV写入器
+_open_writers = []
+
+
+def close_all_writers():
+    for writer in list(_open_writers):
+        writer.close()
+
+
+atexit.register(close_all_writers)
+
+
+class CsvBatchWriter:
+    """批量CSV写入器：在内存中积攒若干行后一次性落盘。
+
+    相比每行 open+写入+close 一个来回，保持文件句柄常开并按 batch_size
+    批量flush，把热循环里的文件系统调用次数摊薄约 batch_size 倍。
+    """
+
+    def __init__(self, filepath, headers, batch_size=32):
+        self.filepath = filepath
+        self.headers = headers
+        self.batch_size = batch_size
+        self._rows = []
+        self._file = None
+        self._writer = None
+
+    def _ensure_open(self):
+        if self._file is not None:
+            return
+        directory = os.path.dirname(self.filepath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        file_exists = os.path.exists(self.filepath)
+        # --- [优化] --- 64KB写缓冲：内核级write系统调用按缓冲填充比例摊薄；
+        # BOM只在新建文件时随表头写入一次
+        self._file = open(self.filepath, 'a', newline='', encoding='utf-8-sig', buffering=1 << 16)
+        self._writer = csv.DictWriter(self._file, fieldnames=self.headers)
+        if not file_exists:
+            self._writer.writeheader()
+        _open_writers.append(self)
+
+    def add(self, row):
+        """缓冲一行数据，攒满 batch_size 行自动落盘"""
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的行全部写入文件"""
+        if not self._rows:
+            return
+        try:
+            self._ensure_open()
+            self._writer.writerows(self._rows)
+            self._file.flush()
+            self._rows.clear()
+        except IOError as e:
+            logging.error(f"写入CSV文件 '{self.filepath}' 失败: {e}")
+
+    def close(self):
+        """flush剩余数据并关闭文件句柄"""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+            if self in _open_writers:
+                _open_writers.remove(self)
+
+
+# --- [优化] --- 模块加载时构建好转换表，sanitize_filename 变成一次C层的translate
+_FN_TRANSLATE = str.maketrans({c: None for c in '\\/*?:"<>|'} | {' ': '_'})
+
+
+def load_doctor_bloom():
+    """加载（或新建）跨医院的医生URL布隆过滤器。
+
+    O(1)判重、每个URL约10比特内存，长线爬取不必反复把每家医院的CSV读成
+    Python集合。0.1%的误判率意味着极个别新医生可能被当作已抓取而跳过，
+    对这个量级的抓取可以接受。
+    """
+    if os.path.exists(BLOOM_FILTER_FILE):
+        try:
+            with open(BLOOM_FILTER_FILE, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logging.warning(f"布隆过滤器 '{BLOOM_FILTER_FILE}' 加载失败: {e}，将重建。")
+    return ScalableBloomFilter(initial_capacity=1_000_000, error_rate=0.001)
+
+
+def save_doctor_bloom(bloom):
+    """把布隆过滤器pickle到磁盘，供下次启动复用"""
+    try:
+        with open(BLOOM_FILTER_FILE, 'wb') as f:
+            pickle.dump(bloom, f)
+    except (OSError, pickle.PicklingError) as e:
+        logging.error(f"布隆过滤器保存失败: {e}")
+
+
+def load_existing_links_mmap(filepath, link_column):
+    """大CSV专用：mmap整个文件按字节扫描，只解码链接一列。
+
+    链接列本身不含逗号/引号，从每行末尾按逗号rsplit即可定位，免去csv
+    逐行解析和全行解码。带引号的介绍字段可能内嵌换行，产生的碎片行解出
+    的值不会与真实URL相同，对集合的成员判断无影响。出错时回退到
+    load_existing_links_from_csv。
+    """
+    if not os.path.exists(filepath):
+        return set()
+    links = set()
     try:
-        with open(filepath, 'a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            if not file_exists: writer.writeheader()
-            writer.writerow(data_dict)
-    except IOError as e:
-        logging.error(f"写入CSV文件 '{filepath}' 失败: {e}")
+        with open(filepath, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                header_end = mm.find(b'\n')
+                if header_end == -1:
+                    return links
+                headers = mm[:header_end].decode('utf-8-sig').rstrip('\r').split(',')
+                if link_column not in headers:
+                    return links
+                # 目标列右侧还有几列，决定从行尾rsplit的份数
+                fields_after = len(headers) - 1 - headers.index(link_column)
+                pos = header_end + 1
+                size = mm.size()
+                while pos < size:
+                    eol = mm.find(b'\n', pos)
+                    if eol == -1:
+                        eol = size
+                    line = mm[pos:eol].rstrip(b'\r')
+                    pos = eol + 1
+                    if not line:
+                        continue
+                    parts = line.rsplit(b',', fields_after + 1)
+                    if len(parts) <= fields_after:
+                        continue
+                    value = parts[-(fields_after + 1)].strip(b'"')
+                    if value:
+                        links.add(value.decode('utf-8', 'ignore'))
+            finally:
+                mm.close()
+        logging.info(f"从 '{os.path.basename(filepath)}' 加载了 {len(links)} 条已存在的链接.")
+    except Exception as e:
+        logging.error(f"mmap读取CSV '{filepath}' 时出错: {e}，回退到csv解析。")
+        return load_existing_links_from_csv(filepath, link_column)
+    return links
 
 
 def sanitize_filename(filename):
     """移除文件名中的非法字符，并将空格替换为下划线"""
-    sanitized = re.sub(r'[\\/*?:"<>|]', "", filename)
-    sanitized = sanitized.replace(" ", "_")
-    return sanitized
+    return filename.translate(_FN_TRANSLATE)
 
 
-def get_hospital_csv_path(output_dir, hospital_id, hospital_name):
-    """根据医院ID和名称生成专属的CSV文件路径"""
+def get_hospital_output_path(output_dir, hospital_id, hospital_name, suffix='.parquet'):
+    """根据医院ID和名称生成专属的输出文件路径"""
     sanitized_name = sanitize_filename(hospital_name)
-    filename = f"hospital_{hospital_id}_{sanitized_name}.csv"
+    filename = f"hospital_{hospital_id}_{sanitized_name}{suffix}"
     return os.path.join(output_dir, filename)
 
 
-# --- Selenium核心功能函数 (这部分无需修改) ---
-def scrape_hospital_info(driver, hospital_id):
-    hospital_url = f"https://www.youlai.cn/yyk/hospindex/{hospital_id}/"
-    driver.get(hospital_url)
-    info = {
+def load_existing_links_from_parquet(filepath, link_column):
+    """从Parquet文件只读链接一列，加载已存在的链接集合"""
+    if not os.path.exists(filepath):
+        return set()
+    try:
+        column = pq.read_table(filepath, columns=[link_column]).column(0)
+        links = {value for value in column.to_pylist() if value}
+        logging.info(f"从 '{os.path.basename(filepath)}' 加载了 {len(links)} 条已存在的链接.")
+        return links
+    except Exception as e:
+        logging.error(f"读取Parquet '{filepath}' 时出错: {e}")
+        return set()
+
+
+def write_hospital_parquet(rows, filepath):
+    """把一家医院抓到的医生行一次性写成Parquet（zstd压缩）。
+
+    文件已存在时（断点续爬）先读回旧表合并再整体重写，保证不丢行。
+    """
+    if not rows:
+        return
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    table = pa.Table.from_pylist(rows, schema=DOCTORS_SCHEMA)
+    try:
+        if os.path.exists(filepath):
+            table = pa.concat_tables([pq.read_table(filepath), table])
+        pq.write_table(table, filepath, compression='zstd')
+    except (OSError, pa.ArrowInvalid) as e:
+        logging.error(f"写入Parquet文件 '{filepath}' 失败: {e}")
+
+
+def extract_fields(html, spec):
+    """按 {字段名: CSS选择器} 的映射从HTML中批量提取字段。
+
+    选择器也可以写成 (选择器, 属性名) 元组来取属性值而非文本。整页只在
+    进程内解析一次，比逐字段走chromedriver的RPC快几个数量级；未命中或
+    为空的字段不会出现在结果里。
+    """
+    tree = HTMLParser(html)
+    fields = {}
+    for field, selector in spec.items():
+        attr = None
+        if isinstance(selector, tuple):
+            selector, attr = selector
+        node = tree.css_first(selector)
+        if node is None:
+            continue
+        value = node.attributes.get(attr) if attr else node.text(strip=True)
+        if value:
+            fields[field] = value
+    return fields
+
+
+# --- HTTP直连抓取函数 ---
+def _empty_hospital_info(hospital_id, hospital_url):
+    """构造医院信息的默认字典"""
+    return {
         '医院序号': hospital_id, '医院名称': 'N/A', 'Logo链接': 'N/A',
         '标签': 'N/A', '医院介绍': 'N/A', '医院官网': 'N/A',
         '医院页面链接': hospital_url
     }
+
+
+def _parse_hospital_html(html, info, hospital_id):
+    """用selectolax解析医院页面的静态HTML，填充info字典。
+
+    返回 (info, success)。静态DOM中找不到医院名称时 success 为 False 且
+    医院名称 保持 'N/A'，表示页面可能依赖JS渲染，调用方应回退到Selenium。
+    """
+    tree = HTMLParser(html)
+    title_node = tree.css_first('title')
+    title = title_node.text() if title_node else ''
+    if "医院未找到" in title or "404" in title:
+        logging.warning(f"医院ID {hospital_id} 无效或页面不存在.")
+        info['医院名称'] = f"无效ID_{hospital_id}"
+        return info, False
+
+    name_node = tree.css_first(CSS_HOSPITAL_NAME)
+    if name_node is None:
+        logging.info(f"医院ID {hospital_id} 静态DOM为空，可能需要JS渲染.")
+        return info, False
+    info['医院名称'] = name_node.text(strip=True)
+
+    logo_node = tree.css_first(CSS_HOSPITAL_LOGO)
+    if logo_node is not None:
+        info['Logo链接'] = logo_node.attributes.get('src') or 'N/A'
+
+    tag_nodes = tree.css(CSS_HOSPITAL_TAGS)
+    if tag_nodes:
+        info['标签'] = ','.join(tag.text(strip=True) for tag in tag_nodes)
+
+    intro_node = tree.css_first(CSS_HOSPITAL_INTRO)
+    if intro_node is not None:
+        info['医院介绍'] = intro_node.text(strip=True)
+
+    for span in tree.css('span'):
+        if span.text(strip=True) == '医院官网':
+            sibling = span.next
+            while sibling is not None and sibling.tag != 'div':
+                sibling = sibling.next
+            if sibling is not None:
+                website = sibling.text(deep=False, strip=True)
+                if website:
+                    info['医院官网'] = website
+            break
+
+    return info, True
+
+
+async def fetch_hospital_info_async(hospital_id, client):
+    """直接用HTTP请求+解析HTML抓取医院信息，免去浏览器渲染的秒级开销。
+
+    返回值与 scrape_hospital_info 相同：(info, success)。当 success 为 False
+    且 医院名称 仍为 'N/A' 时，说明页面是JS渲染的，应回退到Selenium。
+    """
+    hospital_url = f"https://www.youlai.cn/yyk/hospindex/{hospital_id}/"
+    hit = cache_lookup(hospital_url)
+    if hit is not None:
+        logging.info(f"缓存命中，跳过抓取: {hospital_url}")
+        return tuple(hit)
+    info = _empty_hospital_info(hospital_id, hospital_url)
     try:
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'nameTag--J1Jna')]")))
-        if "医院未找到" in driver.title or "404" in driver.title:
-            logging.warning(f"医院ID {hospital_id} 无效或页面不存在.")
-            info['医院名称'] = f"无效ID_{hospital_id}"
-            return info, False
-        info['医院名称'] = driver.find_element(By.XPATH, "//h1[contains(@class, 'name--uPsBN')]").text
-        try:
-            info['Logo链接'] = driver.find_element(By.XPATH,
-                                                   "//div[contains(@class, 'logo--tbtwr')]//img").get_attribute('src')
-        except NoSuchElementException:
-            pass
-        try:
-            tags = driver.find_elements(By.XPATH, "//ul[contains(@class, 'tags--7DM1e')]//span")
-            info['标签'] = ','.join([tag.text for tag in tags])
-        except NoSuchElementException:
-            pass
+        response = await client.get(hospital_url)
+    except httpx.HTTPError as e:
+        logging.warning(f"HTTP请求医院ID {hospital_id} 失败: {e}")
+        info['医院名称'] = f"访问超时_{hospital_id}"
+        return info, False
+    if response.status_code == 404:
+        logging.warning(f"医院ID {hospital_id} 无效或页面不存在.")
+        info['医院名称'] = f"无效ID_{hospital_id}"
+        return info, False
+    info, success = _parse_hospital_html(response.text, info, hospital_id)
+    if success:
+        cache_store(hospital_url, (info, success))
+    return info, success
+
+
+# 医生列表页实际由XHR接口填充，直接调接口可免去整页渲染+滚动加载。
+# 接口路径如有变动，只需改这个模板。
+DOCTOR_LIST_API = "https://www.youlai.cn/api/yyk/hospindex/{hospital_id}/doctors"
+
+
+def fetch_doctor_list_api(hospital_id, main_dept, sub_dept, client, page_size=50):
+    """直接调用医生列表的JSON接口，返回 [{'url', 'avatar_src'}, ...]。
+
+    逐页拉取直到数据取完；接口不可用（请求失败/非200/非JSON）时返回
+    None，调用方回退到Selenium滚动加载。
+    """
+    targets = []
+    page = 1
+    max_pages = 100
+    last_first_url = None
+    while True:
+        params = {'dept': main_dept, 'subDept': sub_dept, 'page': page, 'pageSize': page_size}
         try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'lineClamp__3')]")))
-            info['医院介绍'] = driver.find_element(By.XPATH, "//div[contains(@class, 'lineClamp__3')]").text
-        except (NoSuchElementException, TimeoutException):
-            pass
+            response = client.get(DOCTOR_LIST_API.format(hospital_id=hospital_id), params=params)
+        except httpx.HTTPError as e:
+            logging.warning(f"医生列表接口请求失败: {e}，回退到Selenium。")
+            return None
+        if response.status_code != 200:
+            logging.info(f"医生列表接口返回 {response.status_code}，回退到Selenium。")
+            return None
         try:
-            website_element = driver.find_element(By.XPATH, "//span[text()='医院官网']/following-sibling::div")
-            info['医院官网'] = driver.execute_script("""return arguments[0].firstChild.textContent;""",
-                                                     website_element).strip()
-        except NoSuchElementException:
-            pass
-        return info, True
+            payload = response.json()
+        except ValueError:
+            logging.info("医生列表接口未返回JSON，回退到Selenium。")
+            return None
+        # 必须严格校验 data.list 结构：错误信封（如 {"code":404}）或接口变动
+        # 不能被当成"科室为空"，否则会静默跳过整个科室的医生
+        data = payload.get('data') if isinstance(payload, dict) else None
+        doctors = data.get('list') if isinstance(data, dict) else None
+        if not isinstance(doctors, list):
+            logging.info("医生列表接口返回结构不符合预期，回退到Selenium。")
+            return None
+        if not doctors:
+            break
+        # 有的服务端会忽略未知的分页参数、每页都返回同一份列表，
+        # 用首条URL判断是否在原地打转，避免死循环
+        first_url = doctors[0].get('url') or doctors[0].get('doctorUrl')
+        if first_url is not None and first_url == last_first_url:
+            logging.info("医生列表接口分页无效（每页内容相同），回退到Selenium。")
+            return None
+        last_first_url = first_url
+        for doctor in doctors:
+            url = doctor.get('url') or doctor.get('doctorUrl')
+            if not url:
+                continue
+            if url.startswith('/'):
+                url = f"https://www.youlai.cn{url}"
+            targets.append({'url': url,
+                            'avatar_src': doctor.get('avatar') or doctor.get('photo') or 'N/A'})
+        if len(doctors) < page_size:
+            break
+        page += 1
+        if page > max_pages:
+            logging.warning(f"医生列表接口超过 {max_pages} 页仍未取完，疑似分页异常，回退到Selenium。")
+            return None
+    logging.info(f"    接口返回 {len(targets)} 名医生（{page} 页）。")
+    return targets
+
+
+async def gather_hospitals(hospital_ids, user_agent, concurrency=16, batch_size=32):
+    """第一阶段：用一个连接池并发抓取医院信息，分批写入CSV。
+
+    外层串行for循环是纯I/O等待，并发后吞吐量近似提升 concurrency 倍。
+    返回 {hospital_id: (info, success)}；静态DOM为空（JS渲染）的页面不写CSV，
+    success 为 False 且 医院名称 为 'N/A'，留给第二阶段用Selenium补抓。
+    """
+    results = {}
+    writer = CsvBatchWriter(HOSPITALS_OUTPUT_FILE, HOSPITALS_CSV_HEADERS, batch_size=batch_size)
+    write_lock = asyncio.Lock()  # CSV追加写不是协程安全的，用锁保护
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def scrape_one(hospital_id, client):
+        async with semaphore:
+            info, success = await fetch_hospital_info_async(hospital_id, client)
+        results[hospital_id] = (info, success)
+        if success or info['医院名称'] != 'N/A':
+            async with write_lock:
+                writer.add(info)
+
+    async with httpx.AsyncClient(http2=True, timeout=15, limits=HTTP_LIMITS,
+                                 headers={'User-Agent': user_agent},
+                                 follow_redirects=True) as client:
+        await asyncio.gather(*(scrape_one(hospital_id, client) for hospital_id in hospital_ids))
+    writer.close()
+    return results
+
+
+# --- Selenium核心功能函数 (这部分无需修改) ---
+def make_driver(service, options):
+    """创建Chrome驱动实例。长跑任务中会被周期性重建以释放内存"""
+    driver = webdriver.Chrome(service=service, options=options)
+    # --- [优化] --- 抓取只用到文本和头像的src字符串，不需要真正解码图片：
+    # 在网络层屏蔽图片/字体资源，页面加载字节数可减六到八成。
+    # 资源被屏蔽不影响读取img标签的src属性值。
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {
+            "urls": ["*.woff", "*.woff2", "*.ttf", "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp"]})
+    except Exception as e:
+        logging.debug(f"设置资源屏蔽失败: {e}")
+    return driver
+
+
+@cached(lambda driver, hospital_id: f"https://www.youlai.cn/yyk/hospindex/{hospital_id}/",
+        should_cache=lambda result: result[1])
+def scrape_hospital_info(driver, hospital_id):
+    hospital_url = f"https://www.youlai.cn/yyk/hospindex/{hospital_id}/"
+    driver.get(hospital_url)
+    info = _empty_hospital_info(hospital_id, hospital_url)
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, CSS_HOSPITAL_NAME_TAG)))
     except TimeoutException:
         logging.warning(f"访问医院ID {hospital_id} 页面超时.")
         info['医院名称'] = f"访问超时_{hospital_id}"
         return info, False
+    # --- [优化] --- 渲染完成后只取一次page_source，在进程内用selectolax解析，
+    # 复用HTTP直连路径的解析逻辑，免去逐字段的find_element往返
+    info, success = _parse_hospital_html(driver.page_source, info, hospital_id)
+    if success and info['医院介绍'] == 'N/A':
+        # 介绍模块可能晚于首屏渲染完成，等它出现后重新解析一次
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, CSS_HOSPITAL_INTRO)))
+            info, success = _parse_hospital_html(driver.page_source, info, hospital_id)
+        except TimeoutException:
+            pass
+    return info, success
 
 
+@cached(lambda driver, doctor_url, *args, **kwargs: doctor_url,
+        should_cache=lambda result: result.get('姓名') != 'N/A')
 def get_doctor_details(driver, doctor_url, main_dept, fallback_avatar_src, hospital_name):
     driver.execute_script("window.open(arguments[0]);", doctor_url)
     driver.switch_to.window(driver.window_handles[-1])
@@ -196,38 +745,13 @@ def get_doctor_details(driver, doctor_url, main_dept, fallback_avatar_src, hospi
                    "简介": "N/A", "擅长": "N/A", "医生页链接": doctor_url, "头像链接": "N/A"}
     try:
         WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//section[contains(@class, 'doctorInfoContainer')]")))
-        try:
-            doctor_info["姓名"] = driver.find_element(By.XPATH, "//span[@class='doc-name']").get_attribute(
-                'textContent').strip()
-        except NoSuchElementException:
-            pass
-        try:
-            doctor_info["职称"] = driver.find_element(By.XPATH,
-                                                      "//div[contains(@class, 'doctorInfo--')]//h3/a/span").text
-        except NoSuchElementException:
-            pass
-        try:
-            doctor_info["子科室"] = driver.find_element(By.XPATH, "//div[@class='doc-dept']").text
-        except NoSuchElementException:
-            pass
-        try:
-            intro_element = driver.find_element(By.XPATH, "//div[contains(@class, 'doctorInfoExtraIntro')]")
-            doctor_info["简介"] = driver.execute_script("return arguments[0].textContent.replace('简介：', '').trim()",
-                                                        intro_element)
-        except NoSuchElementException:
-            pass
-        try:
-            skill_element = driver.find_element(By.XPATH, "//div[contains(@class, 'doctorInfoExtraSkill')]")
-            doctor_info["擅长"] = driver.execute_script("return arguments[0].textContent.replace('擅长：', '').trim()",
-                                                        skill_element)
-        except NoSuchElementException:
-            pass
-        try:
-            avatar_element = driver.find_element(By.XPATH, "//div[contains(@class, 'avatarBox--gNp0Z')]//img")
-            doctor_info["头像链接"] = avatar_element.get_attribute('src')
-        except NoSuchElementException:
-            pass
+            EC.presence_of_element_located((By.CSS_SELECTOR, CSS_DOCTOR_CONTAINER)))
+        # --- [优化] --- 只取一次page_source，字段解析在进程内由selectolax完成，
+        # 比通过chromedriver逐字段取值快几个数量级
+        fields = extract_fields(driver.page_source, DOCTOR_FIELD_SPEC)
+        doctor_info.update(fields)
+        doctor_info['简介'] = doctor_info['简介'].replace('简介：', '').strip()
+        doctor_info['擅长'] = doctor_info['擅长'].replace('擅长：', '').strip()
         if not doctor_info["头像链接"] or "N/A" in doctor_info["头像链接"]:
             doctor_info["头像链接"] = fallback_avatar_src
     except TimeoutException:
@@ -239,69 +763,85 @@ def get_doctor_details(driver, doctor_url, main_dept, fallback_avatar_src, hospi
     return doctor_info
 
 
+# --- 多进程医生详情抓取 ---
+_worker_driver = None
+
+
+def _init_detail_worker(chromedriver_path, chrome_args):
+    """进程池初始化：每个工作进程各自启动一个独立的Chrome实例"""
+    global _worker_driver, _cache_conn, _state_conn
+    # Linux下fork会把父进程已打开的SQLite连接和信号处理器一并带过来：
+    # 共用同一个连接对象读写数据库有损坏风险，这里置None让各进程按需重开；
+    # 信号也应只由父进程处理（Ctrl+C会发给整个进程组）
+    _cache_conn = None
+    _state_conn = None
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    options = webdriver.ChromeOptions()
+    for arg in chrome_args:
+        options.add_argument(arg)
+    # 各进程使用独立profile，避免多个Chrome抢同一个用户目录
+    options.add_argument(f'--user-data-dir=/tmp/chrome_{os.getpid()}')
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    service = Service(executable_path=chromedriver_path)
+    _worker_driver = make_driver(service, options)
+    # 工作进程退出走 os._exit，不会执行atexit钩子；
+    # multiprocessing的Finalize在子进程退出流程里会被调用，用它来关Chrome
+    multiprocessing.util.Finalize(None, _worker_driver.quit, exitpriority=0)
+
+
+def _scrape_doctor_detail_worker(target, main_dept, hospital_name):
+    """进程池任务：在工作进程自己的Chrome里抓取单个医生详情"""
+    return get_doctor_details(_worker_driver, target['url'], main_dept,
+                              target['avatar_src'], hospital_name)
+
+
 # --- [优化] --- 使用新的、滚动更平滑的医生目标获取函数
-def get_doctor_targets_optimized(driver: WebDriver, existing_doctor_links_this_hospital: set):
+def get_doctor_targets_optimized(driver: WebDriver, seen_doctor_urls):
     """
     【优化版】高效获取新医生的URL和头像SRC，并保证从上到下顺序处理。
-    """
-    doctor_block_selector = (By.XPATH, "//a[contains(@class, 'block--Ux6NX')]")
+    seen_doctor_urls 支持 `in` 判重即可（布隆过滤器或集合）。
 
+    滚动结束后只通过一次JS拿回纯字符串结果，任何WebElement句柄都不跨
+    滚动边界持有，从根上杜绝StaleElementReferenceException。
+    """
     # 步骤 1: 滚动页面加载所有医生DOM
     logging.info("    滚动页面以加载所有医生...")
+    # --- [优化] --- 用WebDriverWait等待页面高度变化，取代每轮固定sleep(1)：
+    # 站点响应快时立刻进入下一轮，超时即视为懒加载完成
     last_height = driver.execute_script("return document.body.scrollHeight")
     while True:
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(1)  # 等待懒加载内容
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
+        try:
+            WebDriverWait(driver, 3).until(
+                lambda d: d.execute_script("return document.body.scrollHeight") > last_height)
+        except TimeoutException:
             break
-        last_height = new_height
+        last_height = driver.execute_script("return document.body.scrollHeight")
     logging.info("    所有医生DOM加载完毕。")
 
-    # 步骤 2: 获取所有医生元素，这是按页面顺序排列的
-    try:
-        all_blocks = driver.find_elements(*doctor_block_selector)
-        if not all_blocks:
-            logging.warning("    页面上未找到任何医生信息。")
-            return []
-        logging.info(f"    页面共找到 {len(all_blocks)} 名医生，开始筛选和处理...")
-    except TimeoutException:
+    # 步骤 2: 一次execute_script批量取回所有 (链接, 头像) 对——
+    # 对一个200人的科室，把约400次WebDriver往返压缩成1次
+    all_targets = driver.execute_script("""
+        return [...document.querySelectorAll(arguments[0])].map(a => {
+            const img = a.querySelector('img');
+            const src = ['src', 'data-src', 'data-original', 'data-url']
+                .map(k => img ? img.getAttribute(k) : null)
+                .find(v => v && !v.includes('placeholder') && !v.includes('base64')) || 'N/A';
+            return {url: a.href, avatar_src: src};
+        });
+    """, CSS_DOCTOR_BLOCK) or []
+    if not all_targets:
         logging.warning("    页面上未找到任何医生信息。")
         return []
+    logging.info(f"    页面共找到 {len(all_targets)} 名医生，开始筛选...")
 
-    # 步骤 3: 顺序遍历，过滤出新医生并处理
-    new_targets = []
-    new_doctor_count = 0
-    driver.execute_script("window.scrollTo(0, 0);")  # 回到顶部准备顺序处理
-    time.sleep(0.5)
+    # 步骤 3: 在Python侧过滤出新医生，保持页面顺序
+    new_targets = [target for target in all_targets
+                   if target['url'] and target['url'] not in seen_doctor_urls]
 
-    for i, block in enumerate(all_blocks):
-        try:
-            url = block.get_attribute('href')
-            if not url or url in existing_doctor_links_this_hospital:
-                continue
-
-            new_doctor_count += 1
-            avatar_src = "N/A"
-            driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", block)
-            time.sleep(0.4)
-
-            img_element = block.find_element(By.XPATH, ".//img")
-            possible_attrs = ['src', 'data-src', 'data-original', 'data-url']
-            for attr in possible_attrs:
-                src_value = img_element.get_attribute(attr)
-                if src_value and "placeholder" not in src_value and "base64" not in src_value:
-                    avatar_src = src_value
-                    break
-
-            new_targets.append({'url': url, 'avatar_src': avatar_src})
-
-        except (NoSuchElementException, StaleElementReferenceException) as e:
-            logging.warning(f"    处理第 {i + 1} 个医生时出错: {e}，跳过。")
-            continue
-
-    if new_doctor_count > 0:
-        logging.info(f"    发现并处理了 {new_doctor_count} 名新医生。")
+    if new_targets:
+        logging.info(f"    发现 {len(new_targets)} 名新医生。")
     else:
         logging.info("    该科室没有需要抓取的新医生。")
 
@@ -325,6 +865,11 @@ def main():
     # options.add_argument('--headless')
     # options.add_argument('--window-size=1920,1080')
     options.add_argument('--start-maximized')
+    # --- [优化] --- 长跑稳定性参数，避免/dev/shm写满和GPU进程额外开销
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    # --- [优化] --- 不加载图片，只保留文本和属性（头像只取src字符串）
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
 
     progress = load_progress()
     hospital_range_str = progress['hospital_range']
@@ -334,7 +879,7 @@ def main():
         start_range, end_range = map(int, hospital_range_str.split('-'))
         logging.info(f"计划处理医院范围: {start_range} - {end_range}")
     except (ValueError, KeyError):
-        logging.error("医院范围格式错误或不存在，请在crawl_progress.json中设置为 'hospital_range': '开始-结束' 格式。")
+        logging.error("医院范围格式错误或不存在，请把进度里的 'hospital_range' 设置为 '开始-结束' 格式。")
         return
 
     start_main_idx = progress['main_dept_index'] if start_hospital_id == progress.get('current_hospital_id',
@@ -343,14 +888,43 @@ def main():
                                                                                     start_hospital_id) else 0
 
     # --- [优化] --- 不再全局加载所有医生链接，只加载医院信息链接
-    existing_hospital_links = load_existing_links_from_csv(HOSPITALS_OUTPUT_FILE, '医院页面链接')
+    # --- [优化] --- 启动时的医院链接集合可能上万行，用mmap字节扫描加载
+    existing_hospital_links = load_existing_links_mmap(HOSPITALS_OUTPUT_FILE, '医院页面链接')
     pending_targets = load_pending_doctors()
+    # --- [优化] --- 跨医院的医生URL判重走持久化布隆过滤器
+    doctor_bloom = load_doctor_bloom()
+    # --- [优化] --- 待抓取清单只在内存中维护，科室结束/退出时才落盘，
+    # 不再为每个医生做一次数据库写
+    completed_urls = set()
+    # 抓取失败的医生连同所属科室/医院上下文留在失败清单里，
+    # 随待抓取清单一起落盘，下次启动按原上下文重试
+    failed_targets = []
+
+    def persist_pending(signum=None, frame=None):
+        """把内存里尚未完成的待抓取医生落盘，供下次启动恢复"""
+        save_pending_doctors([target for target in pending_targets
+                              if target['url'] not in completed_urls] + failed_targets)
+        if signum is not None:
+            logging.info("收到中断信号，未完成的待抓取清单已保存。")
+            raise KeyboardInterrupt
+
+    signal.signal(signal.SIGINT, persist_pending)
+    signal.signal(signal.SIGTERM, persist_pending)
 
     if pending_targets:
         logging.info(f"检测到 {len(pending_targets)} 名医生待处理，将从中断处恢复...")
     elif start_hospital_id > start_range or start_main_idx > 0 or start_sub_idx > 0:
         logging.info(f"检测到上次进度，将从医院ID {start_hospital_id} 恢复...")
 
+    # --- [优化] --- 第一阶段：医院信息并发抓取（纯HTTP，无需浏览器）
+    ids_to_fetch = [hospital_id for hospital_id in range(start_hospital_id, end_range + 1)
+                    if f"https://www.youlai.cn/yyk/hospindex/{hospital_id}/" not in existing_hospital_links]
+    hospital_results = {}
+    if ids_to_fetch:
+        logging.info(f"第一阶段：并发抓取 {len(ids_to_fetch)} 家医院的基本信息...")
+        hospital_results = asyncio.run(gather_hospitals(ids_to_fetch, random_user_agent))
+        logging.info("第一阶段完成，进入第二阶段（医生抓取）。")
+
     chromedriver_path = '/Users/qkb/Desktop/mycode/my_test_code/my_code/python_spider/chromedriver-mac-arm64/chromedriver'
     service = Service(executable_path=chromedriver_path)
 
@@ -359,18 +933,71 @@ def main():
 
     # 在无头模式下，'--start-maximized' 可能无效，建议用window-size替代
     options.add_argument('--start-maximized')
-    driver = webdriver.Chrome(service=service, options=options)
+    driver = make_driver(service, options)
+    hospitals_since_restart = 0
+
+    # --- [优化] --- 医生详情用进程池并行抓取：每个工作进程一个无头Chrome
+    worker_chrome_args = [
+        f'--user-agent={random_user_agent}',
+        '--headless=new',
+        '--window-size=1920,1080',
+        '--disable-dev-shm-usage',
+        '--disable-gpu',
+    ]
+    detail_executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=DOCTOR_DETAIL_WORKERS,
+        initializer=_init_detail_worker,
+        initargs=(chromedriver_path, worker_chrome_args))
+
+    # --- [优化] --- 批量CSV写入器，避免每条记录开关一次文件
+    hospital_writer = CsvBatchWriter(HOSPITALS_OUTPUT_FILE, HOSPITALS_CSV_HEADERS)
+
+    # --- [优化] --- 医生行先积攒在内存里，医院边界处整表写出Parquet
+    doctor_rows = []
+    current_parquet_path = None
+
+    def flush_doctor_rows():
+        """把当前医院已抓到的医生行写出（Parquet为主，CSV可选导出）"""
+        if not doctor_rows or current_parquet_path is None:
+            return
+        write_hospital_parquet(doctor_rows, current_parquet_path)
+        if EXPORT_DOCTORS_CSV:
+            csv_writer = CsvBatchWriter(current_parquet_path[:-len('.parquet')] + '.csv',
+                                        DOCTORS_CSV_HEADERS)
+            for row in doctor_rows:
+                csv_writer.add(row)
+            csv_writer.close()
+        doctor_rows.clear()
+
+    # --- [优化] --- 整个爬取周期共用一个HTTP/2连接池。UA在连接级固定
+    # （启动时随机选一次），逐请求轮换会破坏keepalive复用
+    http_client = httpx.Client(http2=True, timeout=15,
+                               headers={'User-Agent': random_user_agent},
+                               limits=HTTP_LIMITS, follow_redirects=True)
 
     try:
         for hospital_id in range(start_hospital_id, end_range + 1):
             logging.info(f"{'=' * 20} 开始处理医院 ID: {hospital_id} {'=' * 20}")
+
+            # --- [优化] --- 周期性重启浏览器，防止长会话下Chrome内存膨胀
+            if hospitals_since_restart >= HOSPITALS_PER_DRIVER_RESTART:
+                logging.info(f"已连续处理 {hospitals_since_restart} 家医院，重启浏览器以释放内存...")
+                driver.quit()
+                gc.collect()
+                driver = make_driver(service, options)
+                hospitals_since_restart = 0
+            hospitals_since_restart += 1
+
             save_progress(hospital_id, 0, 0, hospital_range_str)
 
             hospital_page_url = f"https://www.youlai.cn/yyk/hospindex/{hospital_id}/"
             current_hospital_name = "N/A"
             if hospital_page_url not in existing_hospital_links:
-                hospital_info, success = scrape_hospital_info(driver, hospital_id)
-                append_to_csv(hospital_info, HOSPITALS_OUTPUT_FILE, HOSPITALS_CSV_HEADERS)
+                # --- [优化] --- 医院信息已在第一阶段并发抓取，这里只处理JS渲染的漏网页面
+                hospital_info, success = hospital_results.get(hospital_id, (None, False))
+                if hospital_info is None or (not success and hospital_info['医院名称'] == 'N/A'):
+                    hospital_info, success = scrape_hospital_info(driver, hospital_id)
+                    hospital_writer.add(hospital_info)
                 current_hospital_name = hospital_info['医院名称']
                 if not success: continue
             else:
@@ -378,7 +1005,7 @@ def main():
                 driver.get(hospital_page_url)
                 try:
                     current_hospital_name = WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.XPATH, "//h1[contains(@class, 'name--uPsBN')]"))).text
+                        EC.presence_of_element_located((By.CSS_SELECTOR, CSS_HOSPITAL_NAME))).text
                 except TimeoutException:
                     logging.warning("无法获取已存在医院的名称，将使用 N/A。")
 
@@ -386,10 +1013,16 @@ def main():
                 logging.warning(f"医院名称无效 ({current_hospital_name})，跳过该医院的医生抓取。")
                 continue
 
-            hospital_doctor_csv_path = get_hospital_csv_path(DOCTORS_CSV_DIR, hospital_id, current_hospital_name)
+            current_parquet_path = get_hospital_output_path(DOCTORS_CSV_DIR, hospital_id, current_hospital_name)
 
-            # --- [优化] --- 在这里加载当前医院已存在的医生链接
-            existing_links_this_hospital = load_existing_links_from_csv(hospital_doctor_csv_path, '医生页链接')
+            # --- [优化] --- 已存在的医生链接播种进布隆过滤器（兼容旧数据，
+            # add对已有元素是幂等的）；迁移期的旧CSV同样播种
+            for link in load_existing_links_from_parquet(current_parquet_path, '医生页链接'):
+                doctor_bloom.add(link)
+            legacy_csv_path = get_hospital_output_path(DOCTORS_CSV_DIR, hospital_id,
+                                                       current_hospital_name, suffix='.csv')
+            for link in load_existing_links_from_csv(legacy_csv_path, '医生页链接'):
+                doctor_bloom.add(link)
 
             doctor_list_url = f"https://www.youlai.cn/yyk/hospindex/{hospital_id}/doctorlist.html"
             driver.get(doctor_list_url)
@@ -413,8 +1046,7 @@ def main():
                 driver.execute_script("arguments[0].click();", main_departments[i])
                 time.sleep(random.uniform(1.5, 3.5))
 
-                sub_dept_selector = (By.XPATH,
-                                     "//div[contains(@class, 'levelTwo--Ntq0X')]/div[contains(@class, 'text--')]")
+                sub_dept_selector = (By.CSS_SELECTOR, CSS_SUB_DEPT)
                 try:
                     sub_departments = driver.find_elements(*sub_dept_selector)
                 except (NoSuchElementException, TimeoutException):
@@ -442,33 +1074,77 @@ def main():
 
                     if not pending_targets:
                         save_progress(hospital_id, i, sub_dept_index, hospital_range_str)
-                        # --- [优化] --- 调用新的优化函数，并传入当前医院的链接集合
-                        pending_targets = get_doctor_targets_optimized(driver, existing_links_this_hospital)
-                        save_pending_doctors(pending_targets)
+                        # --- [优化] --- 优先走JSON接口拿医生列表，接口不可用再回退到
+                        # Selenium滚动加载
+                        api_targets = fetch_doctor_list_api(hospital_id, main_dept_name, sub_dept_name, http_client)
+                        if api_targets is not None:
+                            pending_targets = [target for target in api_targets
+                                               if target['url'] not in doctor_bloom]
+                        else:
+                            pending_targets = get_doctor_targets_optimized(driver, doctor_bloom)
+                        save_pending_doctors(pending_targets + failed_targets)
 
                     if pending_targets:
                         logging.info(f"    开始处理 {len(pending_targets)} 名待抓取医生...")
-                        for target in list(pending_targets):
-                            doctor_data = get_doctor_details(driver, target['url'], main_dept_name,
-                                                             target['avatar_src'], current_hospital_name)
-                            append_to_csv(doctor_data, hospital_doctor_csv_path, DOCTORS_CSV_HEADERS)
-                            # --- [优化] --- 更新内存中的集合
-                            existing_links_this_hospital.add(doctor_data['医生页链接'])
+                        # --- [优化] --- 把医生详情分发给进程池里的多个Chrome实例并行抓取。
+                        # 失败重试的医生用自己落盘时的科室/医院上下文，其余用当前科室的
+                        futures = {detail_executor.submit(_scrape_doctor_detail_worker, target,
+                                                          target.get('main_dept', main_dept_name),
+                                                          target.get('hospital_name', current_hospital_name)): target
+                                   for target in list(pending_targets)}
+                        retry_rows_by_path = {}
+                        for future in concurrent.futures.as_completed(futures):
+                            target = futures[future]
+                            try:
+                                doctor_data = future.result()
+                            except Exception as e:
+                                logging.warning(f"    抓取医生失败 {target['url']}: {e}，保留在待抓取清单中")
+                                failed = dict(target)
+                                failed.setdefault('main_dept', main_dept_name)
+                                failed.setdefault('hospital_name', current_hospital_name)
+                                failed.setdefault('parquet_path', current_parquet_path)
+                                failed_targets.append(failed)
+                                continue
+                            # 重试成功的医生写回原医院的Parquet，而不是当前医院的
+                            retry_path = target.get('parquet_path')
+                            if retry_path and retry_path != current_parquet_path:
+                                retry_rows_by_path.setdefault(retry_path, []).append(doctor_data)
+                            else:
+                                doctor_rows.append(doctor_data)
+                            # --- [优化] --- 写入成功后登记进布隆过滤器
+                            doctor_bloom.add(doctor_data['医生页链接'])
                             newly_scraped_doctors += 1
                             logging.info(f"    已抓取并保存: {doctor_data['姓名']}, {doctor_data['职称']}")
-                            remove_doctor_from_pending(target['url'])
+                            completed_urls.add(target['url'])
+                        for retry_path, retry_rows in retry_rows_by_path.items():
+                            write_hospital_parquet(retry_rows, retry_path)
                         pending_targets = []
+                        completed_urls.clear()
+                        # 科室结束一次写库；失败的医生保留，重启后重试
+                        save_pending_doctors(list(failed_targets))
 
                 start_sub_idx = 0
 
             start_main_idx = 0
 
+            # --- [优化] --- 医院边界处整表写出Parquet并落盘缓冲，持久化布隆过滤器
+            flush_doctor_rows()
+            hospital_writer.flush()
+            save_doctor_bloom(doctor_bloom)
+
             if newly_scraped_doctors > 0:
                 logging.info(
-                    f"医院ID {hospital_id} 本次共抓取 {newly_scraped_doctors} 条新医生信息到 '{os.path.basename(hospital_doctor_csv_path)}'。")
+                    f"医院ID {hospital_id} 本次共抓取 {newly_scraped_doctors} 条新医生信息到 '{os.path.basename(current_parquet_path)}'。")
             else:
                 logging.info(f"医院ID {hospital_id} 本次未抓取到任何新的医生信息。")
 
+            # --- [优化] --- 医院之间清掉浏览器缓存，顺手触发可用的window.gc
+            try:
+                driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+                driver.execute_script("if (window.gc) window.gc();")
+            except Exception as e:
+                logging.debug(f"清理浏览器缓存失败: {e}")
+
             # --- [优化] --- 抓完一个医院后可以增加一个稍长的随机暂停
             logging.info("进入医院间歇期...")
             time.sleep(random.uniform(5, 15))
@@ -478,6 +1154,12 @@ def main():
         logging.exception(f"发生未知错误: {e}")
         logging.error("程序意外中断。当前进度已保存，下次启动可恢复。")
     finally:
+        persist_pending()
+        save_doctor_bloom(doctor_bloom)
+        flush_doctor_rows()
+        hospital_writer.close()
+        http_client.close()
+        detail_executor.shutdown()
         driver.quit()
         logging.info("浏览器已关闭。")
 